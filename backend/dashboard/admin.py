@@ -1,8 +1,30 @@
 from django.contrib import admin
-from .models import WorldBankData
+from .models import WorldBankData, IndicatorVersion, WorldBankDataChange, SavedDashboard, Country
 
 @admin.register(WorldBankData)
 class WorldBankDataAdmin(admin.ModelAdmin):
     list_display = ('country_name', 'indicator_name', 'year', 'value')
     list_filter = ('country_name', 'indicator_name', 'year')
-    search_fields = ('country_name', 'indicator_name')
\ No newline at end of file
+    search_fields = ('country_name', 'indicator_name')
+
+@admin.register(IndicatorVersion)
+class IndicatorVersionAdmin(admin.ModelAdmin):
+    list_display = ('indicator_code', 'last_updated', 'start_year', 'end_year', 'refreshed_at')
+    search_fields = ('indicator_code',)
+
+@admin.register(WorldBankDataChange)
+class WorldBankDataChangeAdmin(admin.ModelAdmin):
+    list_display = ('indicator_code', 'country_code', 'year', 'old_value', 'new_value', 'source_version', 'changed_at')
+    list_filter = ('indicator_code', 'source_version')
+    search_fields = ('indicator_code', 'country_code')
+
+@admin.register(SavedDashboard)
+class SavedDashboardAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'countries', 'start_year', 'end_year', 'updated_at')
+    search_fields = ('name', 'user__username')
+
+@admin.register(Country)
+class CountryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'code', 'iso2_code', 'region', 'is_aggregate')
+    list_filter = ('is_aggregate', 'region')
+    search_fields = ('name', 'code', 'iso2_code')
@@ -0,0 +1,126 @@
+# File: dashboard/bundles.py
+import logging
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import WorldBankData, IndicatorVersion, SavedDashboard, Country
+from .worldbank import WorldBankAPI, INDICATOR_ALIASES
+
+logger = logging.getLogger(__name__)
+
+# Bundles are rebuilt whenever their data refreshes, so complete ones can live
+# long. A bundle with a failed live fetch is retried soon instead.
+BUNDLE_CACHE_TIMEOUT = 60 * 60 * 24
+BUNDLE_RETRY_TIMEOUT = 60 * 5
+
+
+def bundle_cache_key(user_id, dashboard_id):
+    # The owner is part of the key so serving a bundle needs no ownership query
+    return f"dashboard-bundle:{user_id}:{dashboard_id}"
+
+
+def _series_from_api(items):
+    """Group World Bank API rows into {country: [{year, value}]} like the data endpoints do"""
+    series = {}
+    for item in items:
+        if item and item.get('value') is not None and item.get('country') and item.get('date'):
+            try:
+                series.setdefault(item['country']['value'], []).append({
+                    'year': int(item['date']),
+                    'value': float(item['value'])
+                })
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Error processing item: {item}, error: {e}")
+    for points in series.values():
+        points.sort(key=lambda x: x['year'])
+    return series
+
+
+def indicator_series(indicator_code, country_codes, start_year, end_year):
+    """Series for one indicator and whether it is complete.
+
+    Local data is used only when a refresh covered the whole year range and
+    every requested country has local rows, otherwise the series is fetched
+    live. An empty live result counts as incomplete because WorldBankAPI
+    reports failures as no data.
+    """
+    version = IndicatorVersion.objects.filter(indicator_code=indicator_code).first()
+    if version is not None and version.covers_range(start_year, end_year):
+        iso2_codes, unmapped = Country.to_iso2(country_codes)
+        rows = WorldBankData.objects.filter(
+            indicator_code=indicator_code,
+            country_code__in=iso2_codes,
+            year__gte=start_year,
+            year__lte=end_year,
+            value__isnull=False,
+        ).order_by('country_name', 'year').values_list('country_code', 'country_name', 'year', 'value')
+
+        series = {}
+        found = set()
+        for country_code, country_name, year, value in rows:
+            found.add(country_code)
+            series.setdefault(country_name, []).append({'year': year, 'value': value})
+        if not unmapped and found >= set(iso2_codes):
+            return series, True
+        logger.info(f"{indicator_code} has no local rows for some of {country_codes}, fetching live")
+
+    series = _series_from_api(
+        WorldBankAPI.get_indicator_data(country_codes, indicator_code, start_year, end_year)
+    )
+    return series, bool(series)
+
+
+def build_bundle(dashboard):
+    """Everything needed to render a saved dashboard, in one response"""
+    country_codes = dashboard.country_codes()
+    data = {}
+    incomplete = []
+    for indicator in dashboard.indicators:
+        data[indicator], complete = indicator_series(
+            INDICATOR_ALIASES.get(indicator, indicator),
+            country_codes,
+            dashboard.start_year,
+            dashboard.end_year
+        )
+        if not complete:
+            incomplete.append(indicator)
+    return {
+        'id': dashboard.id,
+        'name': dashboard.name,
+        'countries': country_codes,
+        'start_year': dashboard.start_year,
+        'end_year': dashboard.end_year,
+        'data': data,
+        'incomplete': incomplete,
+        'built_at': timezone.now().isoformat(),
+    }
+
+
+def cache_bundle(dashboard):
+    """Precompute a saved dashboard's bundle and store it in the cache"""
+    bundle = build_bundle(dashboard)
+    timeout = BUNDLE_RETRY_TIMEOUT if bundle['incomplete'] else BUNDLE_CACHE_TIMEOUT
+    cache.set(bundle_cache_key(dashboard.user_id, dashboard.id), bundle, timeout)
+    return bundle
+
+
+def discard_bundle(dashboard):
+    cache.delete(bundle_cache_key(dashboard.user_id, dashboard.id))
+
+
+def rebuild_bundles(indicator_codes):
+    """Recompute the bundles of every saved dashboard using any of the given indicators"""
+    indicator_codes = set(indicator_codes)
+    if not indicator_codes:
+        return 0
+
+    rebuilt = 0
+    for dashboard in SavedDashboard.objects.all():
+        used = {INDICATOR_ALIASES.get(indicator, indicator) for indicator in dashboard.indicators}
+        if used & indicator_codes:
+            cache_bundle(dashboard)
+            rebuilt += 1
+
+    logger.info(f"Rebuilt {rebuilt} dashboard bundles after refreshing {sorted(indicator_codes)}")
+    return rebuilt
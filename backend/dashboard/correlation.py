@@ -0,0 +1,89 @@
+# File: dashboard/correlation.py
+import statistics
+
+from .models import WorldBankData, Country
+
+
+def align_indicators(x_code, y_code, country_codes=None, start_year=2010, end_year=2022):
+    """Join two indicators on (country, year) from locally stored WorldBankData.
+
+    Both indicators come back from a single query and are matched in one
+    pass, so only pairs where both values exist become points. Without
+    country codes every real country is used, leaving out World Bank
+    aggregates such as World or income groups that would double count.
+    """
+    rows = WorldBankData.objects.filter(
+        indicator_code__in=[x_code, y_code],
+        year__gte=start_year,
+        year__lte=end_year,
+        value__isnull=False,
+    )
+    if country_codes:
+        rows = rows.filter(country_code__in=country_codes)
+    else:
+        rows = rows.filter(
+            country_code__in=Country.objects.filter(is_aggregate=False).values('iso2_code')
+        )
+
+    x_values = {}
+    y_values = {}
+    names = {}
+    for country_code, country_name, indicator_code, year, value in rows.values_list(
+        'country_code', 'country_name', 'indicator_code', 'year', 'value'
+    ):
+        names[country_code] = country_name
+        # x_code == y_code is allowed and simply yields a perfect correlation
+        if indicator_code == x_code:
+            x_values[(country_code, year)] = value
+        if indicator_code == y_code:
+            y_values[(country_code, year)] = value
+
+    points = [
+        {
+            'country_code': country_code,
+            'country': names[country_code],
+            'year': year,
+            'x': x_value,
+            'y': y_values[(country_code, year)],
+        }
+        for (country_code, year), x_value in x_values.items()
+        if (country_code, year) in y_values
+    ]
+    points.sort(key=lambda point: (point['country'], point['year']))
+    return points
+
+
+def rank(values):
+    """Ranks starting at 1, ties sharing their average rank"""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        average = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = average
+        i = j + 1
+    return ranks
+
+
+def summarize(points):
+    """Pearson and Spearman coefficients plus a least-squares line for the points.
+
+    Values are None when there are too few points or one side is constant.
+    """
+    xs = [point['x'] for point in points]
+    ys = [point['y'] for point in points]
+    result = {'n': len(points), 'pearson': None, 'spearman': None, 'regression': None}
+
+    try:
+        result['pearson'] = statistics.correlation(xs, ys)
+        result['spearman'] = statistics.correlation(rank(xs), rank(ys))
+        slope, intercept = statistics.linear_regression(xs, ys)
+        result['regression'] = {'slope': slope, 'intercept': intercept}
+    except statistics.StatisticsError:
+        pass
+
+    return result
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.refresh import refresh_indicators
+
+
+class Command(BaseCommand):
+    help = 'Incrementally refresh stored World Bank indicator data, skipping indicators that have not changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('indicators', nargs='*', help='World Bank indicator codes (defaults to every dashboard indicator)')
+        parser.add_argument('--start-year', type=int, default=2010)
+        parser.add_argument('--end-year', type=int, default=2022)
+        parser.add_argument('--force', action='store_true', help='Download even if lastupdated has not changed')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent lastupdated checks')
+
+    def handle(self, *args, **options):
+        results = refresh_indicators(
+            options['indicators'],
+            start_year=options['start_year'],
+            end_year=options['end_year'],
+            force=options['force'],
+            workers=options['workers'],
+        )
+
+        for result in results:
+            self.stdout.write(
+                f"{result['indicator']}: {result['status']} "
+                f"({result['created']} created, {result['updated']} updated)"
+            )
+
+        refreshed = sum(1 for result in results if result['status'] == 'refreshed')
+        failed = sum(1 for result in results if result['status'] == 'failed')
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(results)} indicators checked, {refreshed} refreshed, {failed} failed"
+        ))
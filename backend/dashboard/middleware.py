@@ -0,0 +1,18 @@
+from .ratelimit import INTERACTIVE, upstream_priority
+
+
+class WorldBankPriorityMiddleware:
+    """Marks World Bank calls made while serving a request as interactive, attributed to the user"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            user_key = f"user:{user.id}"
+        else:
+            user_key = f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+        with upstream_priority(INTERACTIVE, user_key):
+            return self.get_response(request)
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicatorVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicator_code', models.CharField(max_length=50, unique=True)),
+                ('last_updated', models.CharField(max_length=20)),
+                ('start_year', models.IntegerField()),
+                ('end_year', models.IntegerField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WorldBankDataChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country_code', models.CharField(max_length=3)),
+                ('indicator_code', models.CharField(max_length=50)),
+                ('year', models.IntegerField()),
+                ('old_value', models.FloatField(blank=True, null=True)),
+                ('new_value', models.FloatField(blank=True, null=True)),
+                ('source_version', models.CharField(blank=True, max_length=20)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-changed_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WorldBankData',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country_code', models.CharField(max_length=3)),
+                ('country_name', models.CharField(max_length=100)),
+                ('indicator_code', models.CharField(max_length=50)),
+                ('indicator_name', models.CharField(max_length=200)),
+                ('year', models.IntegerField()),
+                ('value', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('country_code', 'indicator_code', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('countries', models.CharField(default='US;CN;IN;DE;JP', max_length=500)),
+                ('indicators', models.JSONField(default=list)),
+                ('start_year', models.IntegerField(default=2010)),
+                ('end_year', models.IntegerField(default=2022)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_dashboards', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+                'unique_together': {('user', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_saveddashboard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Country',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=3, unique=True)),
+                ('iso2_code', models.CharField(max_length=2)),
+                ('name', models.CharField(max_length=100)),
+                ('region', models.CharField(blank=True, max_length=100)),
+                ('is_aggregate', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -11,4 +11,85 @@ class WorldBankData(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('country_code', 'indicator_code', 'year')
\ No newline at end of file
+        unique_together = ('country_code', 'indicator_code', 'year')
+
+
+class IndicatorVersion(models.Model):
+    """Last World Bank version of an indicator that was loaded into WorldBankData"""
+    indicator_code = models.CharField(max_length=50, unique=True)
+    last_updated = models.CharField(max_length=20)  # World Bank 'lastupdated' stamp, e.g. '2024-06-28'
+    start_year = models.IntegerField()
+    end_year = models.IntegerField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def covers_range(self, start_year, end_year):
+        """True if the stored data spans the whole year range"""
+        return self.start_year <= start_year and self.end_year >= end_year
+
+    def covers(self, last_updated, start_year, end_year):
+        """True if this version already holds the given stamp for the whole year range"""
+        return self.last_updated == last_updated and self.covers_range(start_year, end_year)
+
+
+class WorldBankDataChange(models.Model):
+    """Change log of values written to WorldBankData by a refresh"""
+    country_code = models.CharField(max_length=3)
+    indicator_code = models.CharField(max_length=50)
+    year = models.IntegerField()
+    old_value = models.FloatField(null=True, blank=True)
+    new_value = models.FloatField(null=True, blank=True)
+    source_version = models.CharField(max_length=20, blank=True)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-changed_at']
+
+
+class SavedDashboard(models.Model):
+    """A user's named dashboard configuration"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_dashboards')
+    name = models.CharField(max_length=100)
+    countries = models.CharField(max_length=500, default='US;CN;IN;DE;JP')  # ';'-separated, as in the API query string
+    indicators = models.JSONField(default=list)  # Indicator codes or dashboard names, e.g. 'gdp', 'co2_emissions'
+    start_year = models.IntegerField(default=2010)
+    end_year = models.IntegerField(default=2022)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'name')
+        ordering = ['name']
+
+    def country_codes(self):
+        return [code.strip().upper() for code in self.countries.split(';') if code.strip()]
+
+
+class Country(models.Model):
+    """World Bank country metadata, used to map ISO3 ids and tell countries from aggregates"""
+    code = models.CharField(max_length=3, unique=True)  # World Bank /country id, ISO3 e.g. 'USA'
+    iso2_code = models.CharField(max_length=2)  # Matches WorldBankData.country_code
+    name = models.CharField(max_length=100)
+    region = models.CharField(max_length=100, blank=True)
+    is_aggregate = models.BooleanField(default=False)  # World, income groups, regional blocks
+
+    @classmethod
+    def to_iso2(cls, codes):
+        """Map ISO2 or ISO3 codes to the ISO2 ids stored locally.
+
+        Returns (iso2 codes, codes that could not be mapped).
+        """
+        codes = [code.strip().upper() for code in codes if code.strip()]
+        iso3_map = dict(
+            cls.objects.filter(code__in=[code for code in codes if len(code) == 3])
+            .values_list('code', 'iso2_code')
+        )
+        iso2_codes = []
+        unknown = []
+        for code in codes:
+            if len(code) == 2:
+                iso2_codes.append(code)
+            elif code in iso3_map:
+                iso2_codes.append(iso3_map[code])
+            else:
+                unknown.append(code)
+        return iso2_codes, unknown
@@ -0,0 +1,166 @@
+# File: dashboard/ratelimit.py
+from contextlib import contextmanager
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows, the budget is then only shared within one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# (priority, user key) of whoever is calling World Bank right now. Anything not
+# running inside a web request (management commands, refreshes) is background.
+_caller = contextvars.ContextVar('worldbank_caller', default=(BACKGROUND, None))
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+@contextmanager
+def upstream_priority(priority, user_key=None):
+    """Attribute World Bank calls made inside the block to a priority and user"""
+    token = _caller.set((priority, user_key))
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+class UpstreamRateLimiter:
+    """Token buckets for World Bank calls, shared by every process on the host.
+
+    The bucket state lives in a small JSON file guarded by flock, so all
+    gunicorn workers and management commands draw from one budget. Background
+    calls may not spend the last `interactive_reserve` tokens, and each user
+    also has a smaller bucket of their own so one heavy user cannot drain the
+    shared one.
+
+    Every call takes one shared token, as it is one upstream request, but
+    charges the user's bucket its cost so wide-range requests use up a
+    user's share faster than narrow ones.
+    """
+
+    def __init__(self, path, rate, burst, user_rate, user_burst, interactive_reserve):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.interactive_reserve = interactive_reserve
+        self._thread_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    @contextmanager
+    def _locked_state(self):
+        with self._thread_lock:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                with os.fdopen(os.dup(fd), 'r+') as f:
+                    try:
+                        state = json.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    @staticmethod
+    def _refill(bucket, rate, burst, now):
+        tokens = bucket.get('tokens', burst) + (now - bucket.get('at', now)) * rate
+        return min(burst, tokens)
+
+    def _take(self, priority, user_key, now, cost=1):
+        """Take a token if one is available, otherwise return how long to wait"""
+        with self._locked_state() as state:
+            blocked_until = state.get('blocked_until', 0)
+            if now < blocked_until:
+                return blocked_until - now
+
+            tokens = self._refill(state.get('global', {}), self.rate, self.burst, now)
+            floor = 0 if priority == INTERACTIVE else self.interactive_reserve
+            wait = max(0, (floor + 1 - tokens) / self.rate)
+
+            users = state.get('users', {})
+            user_tokens = None
+            # Capped at the burst so even the widest request can eventually run
+            user_cost = max(1, min(cost, self.user_burst))
+            if user_key:
+                user_tokens = self._refill(users.get(user_key, {}), self.user_rate, self.user_burst, now)
+                wait = max(wait, (user_cost - user_tokens) / self.user_rate)
+
+            if wait > 0:
+                return wait
+
+            state['global'] = {'tokens': tokens - 1, 'at': now}
+            # Users whose buckets have refilled are indistinguishable from new ones
+            state['users'] = {
+                key: bucket for key, bucket in users.items()
+                if self._refill(bucket, self.user_rate, self.user_burst, now) < self.user_burst
+            }
+            if user_key:
+                state['users'][user_key] = {'tokens': user_tokens - user_cost, 'at': now}
+            return 0
+
+    def acquire(self, cost=1, max_wait=None):
+        """Block until the current caller may make one World Bank request of the given cost"""
+        priority, user_key = _caller.get()
+        if max_wait is None:
+            max_wait = (
+                settings.WORLDBANK_INTERACTIVE_MAX_WAIT if priority == INTERACTIVE
+                else settings.WORLDBANK_BACKGROUND_MAX_WAIT
+            )
+
+        deadline = time.time() + max_wait
+        while True:
+            now = time.time()
+            wait = self._take(priority, user_key, now, cost)
+            if wait <= 0:
+                return
+            if now + wait > deadline:
+                raise RateLimitExceeded(
+                    f"World Bank request budget exhausted for {priority} caller {user_key or ''}".strip()
+                )
+            time.sleep(wait)
+
+    def backoff(self, seconds):
+        """Hold every process off World Bank, e.g. after a 429 response"""
+        with self._locked_state() as state:
+            state['blocked_until'] = max(state.get('blocked_until', 0), time.time() + seconds)
+            state['global'] = {'tokens': 0, 'at': time.time()}
+        logger.warning(f"World Bank throttled us, backing off for {seconds}s")
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = UpstreamRateLimiter(
+            path=settings.WORLDBANK_RATE_LIMIT_FILE,
+            rate=settings.WORLDBANK_RATE_LIMIT,
+            burst=settings.WORLDBANK_BURST,
+            user_rate=settings.WORLDBANK_USER_RATE_LIMIT,
+            user_burst=settings.WORLDBANK_USER_BURST,
+            interactive_reserve=settings.WORLDBANK_INTERACTIVE_RESERVE,
+        )
+    return _limiter
@@ -0,0 +1,206 @@
+# File: dashboard/refresh.py
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from django.db import transaction
+
+from .bundles import rebuild_bundles
+from .models import WorldBankData, IndicatorVersion, WorldBankDataChange, Country
+from .worldbank import (
+    WorldBankAPI,
+    GDP_INDICATOR,
+    POPULATION_INDICATOR,
+    CLIMATE_INDICATORS,
+    EDUCATION_INDICATORS,
+    HEALTH_INDICATORS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Every indicator the dashboard views can ask for
+DASHBOARD_INDICATORS = [
+    GDP_INDICATOR,
+    POPULATION_INDICATOR,
+    *CLIMATE_INDICATORS.values(),
+    *EDUCATION_INDICATORS.values(),
+    *HEALTH_INDICATORS.values(),
+]
+
+
+def _parse_row(item):
+    """Turn a World Bank API row into a (key, fields) pair, or None if unusable"""
+    try:
+        country_code = item['country']['id']
+        year = int(item['date'])
+        value = float(item['value']) if item.get('value') is not None else None
+        return (country_code, year), {
+            'country_name': item['country']['value'],
+            'indicator_name': item['indicator']['value'],
+            'value': value,
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Error processing item: {item}, error: {e}")
+        return None
+
+
+def _stored_range(version, last_updated, start_year, end_year):
+    """Year range the indicator's data is known to be current for after a refresh.
+
+    A refresh at the stamp already held extends the stored range when the two
+    touch or overlap. A new stamp only vouches for the years just downloaded.
+    """
+    if version is None or version.last_updated != last_updated:
+        return start_year, end_year
+    if start_year <= version.end_year + 1 and end_year >= version.start_year - 1:
+        return min(start_year, version.start_year), max(end_year, version.end_year)
+    # Disjoint ranges cannot be recorded as one, keep the wider of the two
+    if end_year - start_year >= version.end_year - version.start_year:
+        return start_year, end_year
+    return version.start_year, version.end_year
+
+
+def refresh_indicator(indicator_code, start_year=2010, end_year=2022, last_updated=None, force=False):
+    """Bring WorldBankData up to date for one indicator.
+
+    Skips the download entirely when World Bank still reports the version we
+    already hold, and otherwise only writes rows whose value changed.
+    """
+    summary = {'indicator': indicator_code, 'status': 'unchanged', 'created': 0, 'updated': 0}
+
+    if last_updated is None:
+        last_updated = WorldBankAPI.get_indicator_last_updated(indicator_code)
+
+    version = IndicatorVersion.objects.filter(indicator_code=indicator_code).first()
+    if not force and version and last_updated and version.covers(last_updated, start_year, end_year):
+        logger.info(f"{indicator_code} unchanged at {last_updated}, skipping")
+        return summary
+
+    snapshot_updated, rows = WorldBankAPI.get_indicator_snapshot(indicator_code, start_year, end_year)
+    if snapshot_updated is None:
+        summary['status'] = 'failed'
+        return summary
+
+    existing = {
+        (obj.country_code, obj.year): obj
+        for obj in WorldBankData.objects.filter(
+            indicator_code=indicator_code,
+            year__gte=start_year,
+            year__lte=end_year,
+        ).only('id', 'country_code', 'year', 'value')
+    }
+
+    to_create = []
+    to_update = []
+    changes = []
+
+    for item in rows:
+        parsed = _parse_row(item)
+        if parsed is None:
+            continue
+        (country_code, year), fields = parsed
+        obj = existing.get((country_code, year))
+
+        if obj is None:
+            if fields['value'] is None:
+                continue
+            to_create.append(WorldBankData(
+                country_code=country_code,
+                indicator_code=indicator_code,
+                year=year,
+                **fields
+            ))
+            old_value = None
+        elif obj.value != fields['value']:
+            old_value = obj.value
+            obj.value = fields['value']
+            to_update.append(obj)
+        else:
+            continue
+
+        changes.append(WorldBankDataChange(
+            country_code=country_code,
+            indicator_code=indicator_code,
+            year=year,
+            old_value=old_value,
+            new_value=fields['value'],
+            source_version=snapshot_updated or '',
+        ))
+
+    with transaction.atomic():
+        WorldBankData.objects.bulk_create(to_create, batch_size=500)
+        WorldBankData.objects.bulk_update(to_update, ['value'], batch_size=500)
+        WorldBankDataChange.objects.bulk_create(changes, batch_size=500)
+        stored_start, stored_end = _stored_range(version, snapshot_updated or '', start_year, end_year)
+        # refreshed_at keys downstream caches, so leave it alone when nothing moved
+        version_moved = version is None or (
+            (version.last_updated, version.start_year, version.end_year)
+            != (snapshot_updated or '', stored_start, stored_end)
+        )
+        if changes or version_moved:
+            IndicatorVersion.objects.update_or_create(
+                indicator_code=indicator_code,
+                defaults={
+                    'last_updated': snapshot_updated or '',
+                    'start_year': stored_start,
+                    'end_year': stored_end,
+                }
+            )
+
+    summary.update({
+        'status': 'refreshed',
+        'created': len(to_create),
+        'updated': len(to_update),
+    })
+    logger.info(f"{indicator_code} refreshed to {snapshot_updated}: {len(to_create)} created, {len(to_update)} updated")
+    return summary
+
+
+def refresh_countries():
+    """Load World Bank country metadata, returning how many countries were stored"""
+    countries = []
+    for item in WorldBankAPI.get_country_metadata():
+        try:
+            region = item.get('region') or {}
+            countries.append(Country(
+                code=item['id'],
+                iso2_code=item['iso2Code'],
+                name=item['name'],
+                region=region.get('value', ''),
+                # World Bank files aggregates under the pseudo-region 'NA'
+                is_aggregate=region.get('id') == 'NA',
+            ))
+        except (KeyError, TypeError) as e:
+            logger.warning(f"Error processing country: {item}, error: {e}")
+
+    if countries:
+        Country.objects.bulk_create(
+            countries,
+            update_conflicts=True,
+            unique_fields=['code'],
+            update_fields=['iso2_code', 'name', 'region', 'is_aggregate'],
+        )
+    logger.info(f"Stored metadata for {len(countries)} countries")
+    return len(countries)
+
+
+def refresh_indicators(indicator_codes=None, start_year=2010, end_year=2022, force=False, workers=8):
+    """Refresh several indicators, checking their lastupdated stamps concurrently"""
+    indicator_codes = list(indicator_codes or DASHBOARD_INDICATORS)
+    refresh_countries()
+
+    # The version checks are one tiny request each, so overlap them. Worker
+    # threads run outside any web request and so count as background traffic.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        stamps = list(executor.map(WorldBankAPI.get_indicator_last_updated, indicator_codes))
+
+    results = [
+        refresh_indicator(code, start_year, end_year, last_updated=stamp, force=force)
+        for code, stamp in zip(indicator_codes, stamps)
+    ]
+
+    # Saved dashboards serve precomputed bundles, so rebuild the ones whose data moved
+    rebuild_bundles(
+        result['indicator'] for result in results
+        if result['created'] or result['updated']
+    )
+    return results
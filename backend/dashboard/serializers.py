@@ -1,7 +1,51 @@
+import re
 from rest_framework import serializers
-from .models import WorldBankData
+from .models import WorldBankData, SavedDashboard, Country
+from .worldbank import INDICATOR_ALIASES
+
+# World Bank indicator codes are dotted, e.g. NY.GDP.MKTP.CD or SE.PRM.NENR
+INDICATOR_CODE_PATTERN = re.compile(r'^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)+$')
+COUNTRY_CODE_PATTERN = re.compile(r'^[A-Za-z0-9]{2,3}$')
 
 class WorldBankDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = WorldBankData
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class SavedDashboardSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SavedDashboard
+        fields = ('id', 'name', 'countries', 'indicators', 'start_year', 'end_year', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'created_at', 'updated_at')
+
+    def validate_indicators(self, value):
+        if not isinstance(value, list) or not value or not all(isinstance(item, str) and item for item in value):
+            raise serializers.ValidationError('Provide a non-empty list of indicator codes or names.')
+        unknown = [
+            item for item in value
+            if item not in INDICATOR_ALIASES and not INDICATOR_CODE_PATTERN.match(item)
+        ]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown indicators: {', '.join(unknown)}. Use a dashboard name or a World Bank code such as NY.GDP.MKTP.CD."
+            )
+        return value
+
+    def validate_countries(self, value):
+        codes = [code.strip() for code in value.split(';') if code.strip()]
+        if not codes:
+            raise serializers.ValidationError('Provide at least one country code.')
+        invalid = [code for code in codes if not COUNTRY_CODE_PATTERN.match(code)]
+        if invalid:
+            raise serializers.ValidationError(f"Invalid country codes: {', '.join(invalid)}")
+        # Store the ISO2 ids refreshed data is keyed by. ISO3 codes not in the
+        # country metadata yet are kept as given, World Bank accepts them live.
+        iso2_codes, unmapped = Country.to_iso2(codes)
+        return ';'.join(iso2_codes + unmapped)
+
+    def validate(self, attrs):
+        start_year = attrs.get('start_year', getattr(self.instance, 'start_year', 2010))
+        end_year = attrs.get('end_year', getattr(self.instance, 'end_year', 2022))
+        if start_year > end_year:
+            raise serializers.ValidationError('start_year must not be after end_year.')
+        return attrs
@@ -0,0 +1,448 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from .bundles import BUNDLE_CACHE_TIMEOUT, BUNDLE_RETRY_TIMEOUT, build_bundle, bundle_cache_key, cache_bundle
+from .correlation import rank, summarize
+from .models import WorldBankData, IndicatorVersion, WorldBankDataChange, SavedDashboard, Country
+from .ratelimit import (
+    BACKGROUND, INTERACTIVE, RateLimitExceeded, UpstreamRateLimiter, upstream_priority
+)
+from .refresh import refresh_countries, refresh_indicator, refresh_indicators
+from .worldbank import WorldBankAPI
+
+# Keep tests off the shared file cache
+test_cache = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+
+
+def wb_row(country_code, year, value, country_name='Testland', indicator_name='Population, total'):
+    return {
+        'country': {'id': country_code, 'value': country_name},
+        'indicator': {'value': indicator_name},
+        'date': str(year),
+        'value': value,
+    }
+
+
+class RefreshIndicatorTests(TestCase):
+    indicator = 'SP.POP.TOTL'
+
+    def setUp(self):
+        patcher = mock.patch('dashboard.refresh.WorldBankAPI.get_indicator_snapshot')
+        self.snapshot = patcher.start()
+        self.addCleanup(patcher.stop)
+        # A missing stamp makes refresh_indicator look one up, keep that offline too
+        patcher = mock.patch('dashboard.refresh.WorldBankAPI.get_indicator_last_updated', return_value=None)
+        self.last_updated = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def refresh(self, last_updated, rows, **kwargs):
+        self.snapshot.return_value = (last_updated, rows)
+        return refresh_indicator(self.indicator, 2010, 2022, last_updated=last_updated, **kwargs)
+
+    def test_first_refresh_creates_rows_and_skips_nulls(self):
+        result = self.refresh('2024-01-01', [wb_row('US', 2020, 1.0), wb_row('CN', 2020, None)])
+
+        self.assertEqual(result['status'], 'refreshed')
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(WorldBankData.objects.count(), 1)
+        self.assertEqual(WorldBankDataChange.objects.get().new_value, 1.0)
+        self.assertEqual(IndicatorVersion.objects.get().last_updated, '2024-01-01')
+
+    def test_unchanged_stamp_skips_download(self):
+        self.refresh('2024-01-01', [wb_row('US', 2020, 1.0)])
+        self.snapshot.reset_mock()
+
+        result = self.refresh('2024-01-01', [wb_row('US', 2020, 1.0)])
+
+        self.assertEqual(result['status'], 'unchanged')
+        self.snapshot.assert_not_called()
+
+    def test_wider_range_is_downloaded_despite_same_stamp(self):
+        self.refresh('2024-01-01', [wb_row('US', 2020, 1.0)])
+        self.snapshot.return_value = ('2024-01-01', [wb_row('US', 2005, 3.0)])
+
+        result = refresh_indicator(self.indicator, 2000, 2022, last_updated='2024-01-01')
+
+        self.assertEqual(result['status'], 'refreshed')
+        self.assertEqual(result['created'], 1)
+
+    def test_changed_value_writes_one_change(self):
+        self.refresh('2024-01-01', [wb_row('US', 2020, 1.0), wb_row('US', 2021, 5.0)])
+        WorldBankDataChange.objects.all().delete()
+
+        result = self.refresh('2024-02-01', [wb_row('US', 2020, 2.0), wb_row('US', 2021, 5.0)])
+
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+        change = WorldBankDataChange.objects.get()
+        self.assertEqual((change.country_code, change.year), ('US', 2020))
+        self.assertEqual((change.old_value, change.new_value), (1.0, 2.0))
+        self.assertEqual(change.source_version, '2024-02-01')
+        self.assertEqual(WorldBankData.objects.get(country_code='US', year=2020).value, 2.0)
+
+    def test_noop_refresh_leaves_version_untouched(self):
+        self.refresh('2024-01-01', [wb_row('US', 2020, 1.0)])
+        refreshed_at = IndicatorVersion.objects.get().refreshed_at
+
+        # A failed lastupdated check falls through to a full download
+        self.snapshot.return_value = ('2024-01-01', [wb_row('US', 2020, 1.0)])
+        result = refresh_indicator(self.indicator, 2010, 2022)
+
+        self.assertEqual((result['created'], result['updated']), (0, 0))
+        self.assertEqual(IndicatorVersion.objects.get().refreshed_at, refreshed_at)
+        self.assertEqual(WorldBankDataChange.objects.count(), 1)
+
+    def test_adjacent_range_at_same_stamp_is_merged(self):
+        self.refresh('2024-01-01', [wb_row('US', 2020, 1.0)])
+        self.snapshot.return_value = ('2024-01-01', [wb_row('US', 2005, 3.0)])
+
+        refresh_indicator(self.indicator, 2000, 2009, last_updated='2024-01-01')
+
+        version = IndicatorVersion.objects.get()
+        self.assertEqual((version.start_year, version.end_year), (2000, 2022))
+
+    def test_disjoint_range_keeps_the_wider_one(self):
+        self.refresh('2024-01-01', [wb_row('US', 2020, 1.0)])
+        self.snapshot.return_value = ('2024-01-01', [wb_row('US', 1995, 3.0)])
+
+        refresh_indicator(self.indicator, 1995, 1996, last_updated='2024-01-01')
+
+        version = IndicatorVersion.objects.get()
+        self.assertEqual((version.start_year, version.end_year), (2010, 2022))
+
+    def test_new_stamp_only_covers_the_downloaded_range(self):
+        self.refresh('2024-01-01', [wb_row('US', 2020, 1.0)])
+        self.snapshot.return_value = ('2024-02-01', [wb_row('US', 2015, 3.0)])
+
+        refresh_indicator(self.indicator, 2015, 2022, last_updated='2024-02-01')
+
+        version = IndicatorVersion.objects.get()
+        self.assertEqual((version.last_updated, version.start_year, version.end_year), ('2024-02-01', 2015, 2022))
+
+    def test_failed_snapshot_writes_nothing(self):
+        result = self.refresh(None, [])
+
+        self.assertEqual(result['status'], 'failed')
+        self.assertFalse(IndicatorVersion.objects.exists())
+
+
+class RefreshCountriesTests(TestCase):
+    @mock.patch('dashboard.refresh.WorldBankAPI.get_country_metadata')
+    def test_aggregates_are_flagged(self, get_country_metadata):
+        get_country_metadata.return_value = [
+            {'id': 'USA', 'iso2Code': 'US', 'name': 'United States', 'region': {'id': 'NAC', 'value': 'North America'}},
+            {'id': 'WLD', 'iso2Code': '1W', 'name': 'World', 'region': {'id': 'NA', 'value': 'Aggregates'}},
+        ]
+
+        self.assertEqual(refresh_countries(), 2)
+        self.assertEqual(refresh_countries(), 2)
+
+        self.assertEqual(
+            dict(Country.objects.values_list('iso2_code', 'is_aggregate')),
+            {'US': False, '1W': True}
+        )
+
+
+@test_cache
+class CorrelateViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        for code, iso2_code, gdp, life in (('USA', 'US', 1.0, 70.0), ('IND', 'IN', 2.0, 75.0), ('CHN', 'CN', 3.0, 79.0), ('WLD', '1W', 9.0, 60.0)):
+            Country.objects.create(code=code, iso2_code=iso2_code, name=code, is_aggregate=code == 'WLD')
+            for indicator_code, value in (('NY.GDP.MKTP.CD', gdp), ('SP.DYN.LE00.IN', life)):
+                WorldBankData.objects.create(
+                    country_code=iso2_code, country_name=code, indicator_code=indicator_code,
+                    indicator_name=indicator_code, year=2020, value=value
+                )
+        for indicator_code in ('NY.GDP.MKTP.CD', 'SP.DYN.LE00.IN'):
+            IndicatorVersion.objects.create(
+                indicator_code=indicator_code, last_updated='2024-01-01', start_year=2010, end_year=2022
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('analyst', password='pw'))
+
+    def correlate(self, **params):
+        return self.client.get('/api/correlate/', {'x': 'gdp', 'y': 'life_expectancy', 'year': 2020, **params})
+
+    def test_lower_case_codes_match(self):
+        response = self.correlate(countries='us;in')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['n'], 2)
+        self.assertAlmostEqual(response.data['pearson'], 1.0)
+
+    def test_iso3_codes_are_mapped(self):
+        response = self.correlate(countries='usa;IND')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({point['country_code'] for point in response.data['points']}, {'US', 'IN'})
+
+    def test_unknown_codes_are_rejected(self):
+        response = self.correlate(countries='XXX;IN')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('XXX', response.data['error'])
+
+    def test_default_countries_leave_out_aggregates(self):
+        response = self.correlate()
+
+        self.assertEqual(response.data['n'], 3)
+        self.assertNotIn('1W', {point['country_code'] for point in response.data['points']})
+
+    def test_unrefreshed_indicator_is_reported(self):
+        response = self.correlate(y='co2_emissions')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['missing'], [{'indicator': 'EN.ATM.CO2E.PC', 'refreshed_years': None}])
+
+    def test_years_outside_refreshed_range_are_reported(self):
+        response = self.correlate(year=2000)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            [item['refreshed_years'] for item in response.data['missing']],
+            [[2010, 2022], [2010, 2022]]
+        )
+
+    def test_regression_is_optional(self):
+        self.assertNotIn('regression', self.correlate().data)
+
+        regression = self.correlate(regression='true').data['regression']
+        self.assertEqual(set(regression), {'slope', 'intercept'})
+
+    @mock.patch('dashboard.refresh.WorldBankAPI.get_indicator_snapshot')
+    def test_refresh_invalidates_cached_result(self, snapshot):
+        before = self.correlate().data
+        self.assertEqual(self.correlate().data, before)
+
+        snapshot.return_value = ('2024-02-01', [wb_row('US', 2020, 80.0, 'USA', 'Life expectancy')])
+        refresh_indicator('SP.DYN.LE00.IN', 2010, 2022, last_updated='2024-02-01')
+
+        after = self.correlate().data
+        self.assertEqual(
+            next(point['y'] for point in after['points'] if point['country_code'] == 'US'), 80.0
+        )
+        self.assertNotEqual(after['pearson'], before['pearson'])
+
+
+class SummarizeTests(TestCase):
+    def points(self, xs, ys):
+        return [{'x': x, 'y': y} for x, y in zip(xs, ys)]
+
+    def test_rank_averages_ties(self):
+        self.assertEqual(rank([10, 20, 20, 30]), [1, 2.5, 2.5, 4])
+
+    def test_spearman_with_ties(self):
+        result = summarize(self.points([1, 2, 2, 3], [1, 3, 2, 4]))
+
+        self.assertAlmostEqual(result['spearman'], 0.9 ** 0.5)
+
+    def test_regression_line(self):
+        result = summarize(self.points([1, 2, 3], [3, 5, 7]))
+
+        self.assertAlmostEqual(result['regression']['slope'], 2.0)
+        self.assertAlmostEqual(result['regression']['intercept'], 1.0)
+
+    def test_constant_side_gives_no_coefficients(self):
+        result = summarize(self.points([1, 2, 3], [5, 5, 5]))
+
+        self.assertEqual((result['n'], result['pearson'], result['spearman'], result['regression']), (3, None, None, None))
+
+    def test_single_point_gives_no_coefficients(self):
+        result = summarize(self.points([1], [2]))
+
+        self.assertEqual((result['pearson'], result['spearman'], result['regression']), (None, None, None))
+
+
+@test_cache
+class SavedDashboardBundleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('planner', password='pw')
+        WorldBankData.objects.create(
+            country_code='US', country_name='United States', indicator_code='NY.GDP.MKTP.CD',
+            indicator_name='GDP', year=2020, value=1.0
+        )
+        IndicatorVersion.objects.create(
+            indicator_code='NY.GDP.MKTP.CD', last_updated='2024-01-01', start_year=2010, end_year=2022
+        )
+
+    def dashboard(self, start_year, countries='us'):
+        return SavedDashboard.objects.create(
+            user=self.user, name=f'{countries} from {start_year}', countries=countries, indicators=['gdp'],
+            start_year=start_year, end_year=2022
+        )
+
+    @mock.patch('dashboard.bundles.WorldBankAPI.get_indicator_data')
+    def test_covered_range_is_served_locally(self, get_indicator_data):
+        bundle = build_bundle(self.dashboard(2010))
+
+        get_indicator_data.assert_not_called()
+        self.assertEqual(bundle['data']['gdp'], {'United States': [{'year': 2020, 'value': 1.0}]})
+        self.assertEqual(bundle['incomplete'], [])
+
+    @mock.patch('dashboard.bundles.WorldBankAPI.get_indicator_data')
+    def test_uncovered_range_is_fetched_live(self, get_indicator_data):
+        get_indicator_data.return_value = [{'country': {'value': 'United States'}, 'date': '2005', 'value': 0.5}]
+
+        bundle = build_bundle(self.dashboard(2000))
+
+        get_indicator_data.assert_called_once_with(['US'], 'NY.GDP.MKTP.CD', 2000, 2022)
+        self.assertEqual(bundle['data']['gdp'], {'United States': [{'year': 2005, 'value': 0.5}]})
+
+    @mock.patch('dashboard.bundles.cache')
+    @mock.patch('dashboard.bundles.WorldBankAPI.get_indicator_data', return_value=[])
+    def test_failed_live_fetch_is_cached_briefly(self, get_indicator_data, bundle_cache):
+        bundle = cache_bundle(self.dashboard(2000))
+
+        self.assertEqual(bundle['incomplete'], ['gdp'])
+        self.assertEqual(bundle_cache.set.call_args.args[2], BUNDLE_RETRY_TIMEOUT)
+
+        cache_bundle(self.dashboard(2010))
+        self.assertEqual(bundle_cache.set.call_args.args[2], BUNDLE_CACHE_TIMEOUT)
+
+    @mock.patch('dashboard.bundles.WorldBankAPI.get_indicator_data')
+    def test_iso3_codes_are_served_locally(self, get_indicator_data):
+        Country.objects.create(code='USA', iso2_code='US', name='United States')
+
+        bundle = build_bundle(self.dashboard(2010, countries='USA'))
+
+        get_indicator_data.assert_not_called()
+        self.assertEqual(bundle['data']['gdp'], {'United States': [{'year': 2020, 'value': 1.0}]})
+
+    @mock.patch('dashboard.bundles.WorldBankAPI.get_indicator_data', return_value=[])
+    def test_country_without_local_rows_is_fetched_live(self, get_indicator_data):
+        bundle = build_bundle(self.dashboard(2010, countries='US;FR'))
+
+        get_indicator_data.assert_called_once_with(['US', 'FR'], 'NY.GDP.MKTP.CD', 2010, 2022)
+        self.assertEqual(bundle['incomplete'], ['gdp'])
+
+    def test_iso3_codes_are_stored_as_iso2(self):
+        Country.objects.create(code='USA', iso2_code='US', name='United States')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with mock.patch('dashboard.bundles.WorldBankAPI.get_indicator_data', return_value=[]):
+            response = client.post('/api/dashboards/', {'name': 'iso3', 'countries': 'usa;DEU', 'indicators': ['gdp']}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['countries'], 'US;DEU')
+
+    @mock.patch('dashboard.bundles.WorldBankAPI.get_indicator_data', return_value=[])
+    def test_other_users_cannot_read_a_dashboard(self, get_indicator_data):
+        dashboard = self.dashboard(2010)
+        cache_bundle(dashboard)
+        intruder = APIClient()
+        intruder.force_authenticate(User.objects.create_user('intruder', password='pw'))
+
+        for url in (f'/api/dashboards/{dashboard.id}/', f'/api/dashboards/{dashboard.id}/bundle/'):
+            self.assertEqual(intruder.get(url).status_code, 404)
+        self.assertEqual(intruder.delete(f'/api/dashboards/{dashboard.id}/').status_code, 404)
+        self.assertTrue(SavedDashboard.objects.filter(id=dashboard.id).exists())
+
+    @mock.patch('dashboard.refresh.WorldBankAPI.get_country_metadata', return_value=[])
+    @mock.patch('dashboard.refresh.WorldBankAPI.get_indicator_last_updated', return_value='2024-02-01')
+    @mock.patch('dashboard.refresh.WorldBankAPI.get_indicator_snapshot')
+    def test_refresh_rebuilds_cached_bundle(self, snapshot, last_updated, country_metadata):
+        dashboard = self.dashboard(2010)
+        cache_bundle(dashboard)
+        snapshot.return_value = ('2024-02-01', [wb_row('US', 2020, 2.0, 'United States', 'GDP')])
+
+        refresh_indicators(['NY.GDP.MKTP.CD'], 2010, 2022)
+
+        bundle = cache.get(bundle_cache_key(self.user.id, dashboard.id))
+        self.assertEqual(bundle['data']['gdp'], {'United States': [{'year': 2020, 'value': 2.0}]})
+
+    def test_unknown_indicators_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.post('/api/dashboards/', {'name': 'typo', 'indicators': ['gpd', 'NY.GDP/../x']}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('gpd', str(response.data['indicators']))
+        self.assertFalse(SavedDashboard.objects.filter(name='typo').exists())
+
+
+class UpstreamRateLimiterTests(TestCase):
+    now = 1000.0
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.limiter = UpstreamRateLimiter(
+            path=os.path.join(directory.name, 'state.json'),
+            rate=1, burst=5, user_rate=1, user_burst=2, interactive_reserve=2,
+        )
+
+    def drain(self, priority, user_key=None, now=None):
+        taken = 0
+        while self.limiter._take(priority, user_key, now or self.now) == 0:
+            taken += 1
+        return taken
+
+    def test_tokens_refill_with_time(self):
+        self.assertEqual(self.drain(INTERACTIVE), 5)
+        self.assertAlmostEqual(self.limiter._take(INTERACTIVE, None, self.now), 1.0)
+        self.assertEqual(self.limiter._take(INTERACTIVE, None, self.now + 1), 0)
+
+    def test_background_stops_at_interactive_reserve(self):
+        self.assertEqual(self.drain(BACKGROUND), 3)
+        self.assertGreater(self.limiter._take(BACKGROUND, None, self.now), 0)
+        self.assertEqual(self.drain(INTERACTIVE), 2)
+
+    def test_per_user_bucket_does_not_starve_others(self):
+        self.assertEqual(self.drain(INTERACTIVE, 'user:1'), 2)
+        self.assertEqual(self.limiter._take(INTERACTIVE, 'user:2', self.now), 0)
+
+    def test_wide_request_spends_more_of_the_users_share(self):
+        self.assertEqual(self.limiter._take(INTERACTIVE, 'user:1', self.now, cost=2), 0)
+
+        self.assertAlmostEqual(self.limiter._take(INTERACTIVE, 'user:1', self.now, cost=1), 1.0)
+        self.assertEqual(self.limiter._take(INTERACTIVE, 'user:2', self.now, cost=1), 0)
+
+    def test_cost_is_capped_at_user_burst(self):
+        self.assertEqual(self.limiter._take(INTERACTIVE, 'user:1', self.now, cost=50), 0)
+        self.assertAlmostEqual(self.limiter._take(INTERACTIVE, 'user:1', self.now, cost=50), 2.0)
+
+    def test_refilled_user_buckets_are_pruned(self):
+        self.drain(INTERACTIVE, 'user:1')
+        self.limiter._take(INTERACTIVE, 'user:2', self.now + 10)
+
+        with self.limiter._locked_state() as state:
+            self.assertEqual(list(state['users']), ['user:2'])
+
+    def test_backoff_blocks_every_caller(self):
+        self.limiter.backoff(30)
+        now = time.time()
+
+        for priority, user_key in ((INTERACTIVE, None), (INTERACTIVE, 'user:1'), (BACKGROUND, None)):
+            self.assertGreater(self.limiter._take(priority, user_key, now), 25)
+        self.assertEqual(self.limiter._take(INTERACTIVE, None, now + 31), 0)
+
+    def test_acquire_raises_when_wait_exceeds_limit(self):
+        self.limiter.backoff(30)
+
+        with upstream_priority(INTERACTIVE, 'user:1'):
+            with self.assertRaises(RateLimitExceeded):
+                self.limiter.acquire(max_wait=1)
+
+
+class IndicatorRequestCostTests(TestCase):
+    @mock.patch('dashboard.worldbank.WorldBankAPI.request')
+    def test_cost_grows_with_countries_and_years(self, request):
+        request.return_value.status_code = 500
+
+        WorldBankAPI.get_indicator_data(['US', 'CN', 'IN', 'DE', 'JP'], 'SP.POP.TOTL', 2010, 2022)
+        WorldBankAPI.get_indicator_data(['US', 'CN', 'IN', 'DE', 'JP'], 'SP.POP.TOTL', 1960, 2022)
+        WorldBankAPI.get_indicator_data(['US'], 'SP.POP.TOTL', 2020, 2020)
+
+        self.assertEqual([call.kwargs['cost'] for call in request.call_args_list], [1, 5, 1])
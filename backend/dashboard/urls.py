@@ -13,5 +13,9 @@ urlpatterns = [
     path('api/climate-data/', views.get_climate_data, name='api_climate_data'),
     path('api/education-data/', views.get_education_data, name='api_education_data'),
     path('api/health-data/', views.get_health_data, name='api_health_data'),
+    path('api/correlate/', views.get_correlation, name='api_correlate'),
+    path('api/dashboards/', views.saved_dashboards, name='api_saved_dashboards'),
+    path('api/dashboards/<int:dashboard_id>/', views.saved_dashboard_detail, name='api_saved_dashboard_detail'),
+    path('api/dashboards/<int:dashboard_id>/bundle/', views.saved_dashboard_bundle, name='api_saved_dashboard_bundle'),
     path('api/test/', views.test_worldbank_api, name='api_test'),  # Debug endpoint
 ]
\ No newline at end of file
@@ -8,15 +8,30 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.http import JsonResponse
-import requests
+from django.core.cache import cache
+from django.db import IntegrityError
 import json
+import hashlib
 import logging
-from .models import WorldBankData
-from .serializers import WorldBankDataSerializer
+from .models import WorldBankData, IndicatorVersion, SavedDashboard, Country
+from .serializers import WorldBankDataSerializer, SavedDashboardSerializer
+from .bundles import bundle_cache_key, cache_bundle, discard_bundle
+from .correlation import align_indicators, summarize
+from .worldbank import (
+    WorldBankAPI,
+    GDP_INDICATOR,
+    POPULATION_INDICATOR,
+    CLIMATE_INDICATORS,
+    EDUCATION_INDICATORS,
+    HEALTH_INDICATORS,
+    INDICATOR_ALIASES,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+CORRELATE_CACHE_TIMEOUT = 60 * 60 * 6
+
 def login_view(request):
     if request.method == 'POST':
         form = AuthenticationForm(data=request.POST)
@@ -48,74 +63,6 @@ def register_view(request):
 def dashboard_view(request):
     return render(request, 'dashboard/dashboard.html')
 
-class WorldBankAPI:
-    BASE_URL = "https://api.worldbank.org/v2"
-    
-    @staticmethod
-    def get_countries():
-        """Get list of countries"""
-        try:
-            url = f"{WorldBankAPI.BASE_URL}/country?format=json&per_page=300"
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, timeout=30, headers=headers)
-            logger.info(f"Countries API response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Countries API response length: {len(data)}")
-                if len(data) > 1:
-                    countries = []
-                    for country in data[1]:
-                        if country.get('capitalCity') and country.get('id') not in ['WLD', 'EUU', 'HPC', 'IBD', 'IBT', 'IDB', 'IDX', 'IDA', 'LIC', 'LMC', 'LMY', 'LTE', 'MIC', 'MNA', 'NAC', 'OED', 'PSS', 'PST', 'SAS', 'SSA', 'SSF', 'SST', 'TEA', 'TEC', 'TLA', 'TMN', 'TSA', 'TSS', 'UMC']:
-                            countries.append({
-                                'code': country['id'],
-                                'name': country['name']
-                            })
-                    logger.info(f"Found {len(countries)} valid countries")
-                    return countries[:30]  # Limit to 30 countries
-            return []
-        except Exception as e:
-            logger.error(f"Error fetching countries: {e}")
-            return []
-    
-    @staticmethod
-    def get_indicator_data(country_codes, indicator, start_year=2010, end_year=2022):
-        """Get indicator data for countries"""
-        try:
-            # Clean country codes
-            country_codes = [code.strip() for code in country_codes if code.strip()]
-            countries_str = ';'.join(country_codes)
-            
-            url = f"{WorldBankAPI.BASE_URL}/country/{countries_str}/indicator/{indicator}"
-            params = {
-                'format': 'json',
-                'date': f"{start_year}:{end_year}",
-                'per_page': 2000
-            }
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            logger.info(f"Fetching data from: {url} with params: {params}")
-            response = requests.get(url, params=params, timeout=30, headers=headers)
-            logger.info(f"Indicator API response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Indicator API response structure: {type(data)}, length: {len(data) if isinstance(data, list) else 'N/A'}")
-                
-                if isinstance(data, list) and len(data) > 1 and data[1]:
-                    logger.info(f"Found {len(data[1])} data points")
-                    return data[1]
-                elif isinstance(data, dict) and 'message' in data:
-                    logger.warning(f"API returned message: {data['message']}")
-            return []
-        except Exception as e:
-            logger.error(f"Error fetching indicator data: {e}")
-            return []
-
 # Debug endpoint to test API directly
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -124,7 +71,7 @@ def test_worldbank_api(request):
     try:
         # Test basic connectivity
         test_url = "https://api.worldbank.org/v2/country/US/indicator/NY.GDP.MKTP.CD?format=json&date=2020:2022"
-        response = requests.get(test_url, timeout=30)
+        response = WorldBankAPI.request(test_url)
         
         return Response({
             'status': response.status_code,
@@ -176,7 +123,7 @@ def get_gdp_data(request):
         # Use NY.GDP.MKTP.CD (GDP current US$) as requested in the iframe
         gdp_data = WorldBankAPI.get_indicator_data(
             country_codes, 
-            'NY.GDP.MKTP.CD',  # Total GDP instead of per capita
+            GDP_INDICATOR,  # Total GDP instead of per capita
             start_year, 
             end_year
         )
@@ -232,7 +179,7 @@ def get_population_data(request):
         # Population indicator
         pop_data = WorldBankAPI.get_indicator_data(
             country_codes, 
-            'SP.POP.TOTL', 
+            POPULATION_INDICATOR,
             start_year, 
             end_year
         )
@@ -287,12 +234,7 @@ def get_climate_data(request):
     
     logger.info(f"Fetching climate data ({indicator_type}) for countries: {country_codes}, years: {start_year}-{end_year}")
     
-    # Map indicator types to World Bank codes
-    indicator_map = {
-        'co2_emissions': 'EN.ATM.CO2E.PC',  # CO2 emissions (metric tons per capita)
-        'renewable_energy': 'EG.FEC.RNEW.ZS',  # Renewable energy consumption (% of total final energy consumption)
-        'forest_area': 'AG.LND.FRST.ZS'  # Forest area (% of land area)
-    }
+    indicator_map = CLIMATE_INDICATORS
     
     wb_indicator = indicator_map.get(indicator_type, 'EN.ATM.CO2E.PC')
     
@@ -373,12 +315,7 @@ def get_education_data(request):
     
     logger.info(f"Fetching education data ({indicator_type}) for countries: {country_codes}, years: {start_year}-{end_year}")
     
-    # Map indicator types to World Bank codes
-    indicator_map = {
-        'literacy_rate': 'SE.ADT.LITR.ZS',  # Adult literacy rate (% of people ages 15 and above)
-        'school_enrollment': 'SE.PRM.NENR',  # Primary school enrollment (% net)
-        'completion_rate': 'SE.PRM.CMPT.ZS'  # Primary completion rate (% of relevant age group)
-    }
+    indicator_map = EDUCATION_INDICATORS
     
     wb_indicator = indicator_map.get(indicator_type, 'SE.ADT.LITR.ZS')
     
@@ -459,12 +396,7 @@ def get_health_data(request):
     
     logger.info(f"Fetching health data ({indicator_type}) for countries: {country_codes}, years: {start_year}-{end_year}")
     
-    # Map indicator types to World Bank codes
-    indicator_map = {
-        'life_expectancy': 'SP.DYN.LE00.IN',  # Life expectancy at birth, total (years)
-        'infant_mortality': 'SP.DYN.IMRT.IN',  # Mortality rate, infant (per 1,000 live births)
-        'malnutrition': 'SH.STA.MALN.ZS'  # Malnutrition prevalence (% of children under 5)
-    }
+    indicator_map = HEALTH_INDICATORS
     
     wb_indicator = indicator_map.get(indicator_type, 'SP.DYN.LE00.IN')
     
@@ -532,4 +464,164 @@ def get_health_data(request):
         
     except Exception as e:
         logger.error(f"Error in get_health_data: {e}")
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_correlation(request):
+    """API endpoint joining two indicators across countries for scatter plots and correlation"""
+    x_param = request.GET.get('x')
+    y_param = request.GET.get('y')
+    if not x_param or not y_param:
+        return Response({'error': 'Both x and y indicators are required'}, status=400)
+    
+    x_indicator = INDICATOR_ALIASES.get(x_param, x_param)
+    y_indicator = INDICATOR_ALIASES.get(y_param, y_param)
+    countries_param = request.GET.get('countries', '')
+    # Local data is keyed by World Bank's two-letter ids, so map ISO3 codes like USA
+    country_codes, unknown = Country.to_iso2(countries_param.split(';'))
+    if unknown:
+        return Response({'error': f"Unknown country codes: {', '.join(unknown)}"}, status=400)
+    country_codes = sorted(set(country_codes))
+    include_regression = request.GET.get('regression', '').lower() in ('1', 'true', 'yes')
+    
+    try:
+        if request.GET.get('year'):
+            start_year = end_year = int(request.GET['year'])
+        else:
+            start_year = int(request.GET.get('start_year', 2010))
+            end_year = int(request.GET.get('end_year', 2022))
+    except ValueError:
+        return Response({'error': 'Years must be integers'}, status=400)
+    
+    logger.info(f"Correlating {x_indicator} vs {y_indicator} for countries: {country_codes or 'all'}, years: {start_year}-{end_year}")
+    
+    try:
+        versions = {
+            version.indicator_code: version
+            for version in IndicatorVersion.objects.filter(indicator_code__in=[x_indicator, y_indicator])
+        }
+        # Only locally refreshed data is correlated, so say what is missing rather than return nothing
+        missing = [
+            {
+                'indicator': code,
+                'refreshed_years': [versions[code].start_year, versions[code].end_year] if code in versions else None
+            }
+            for code in dict.fromkeys([x_indicator, y_indicator])
+            if code not in versions or not versions[code].covers_range(start_year, end_year)
+        ]
+        if missing:
+            return Response({
+                'error': f"Indicator data for {start_year}-{end_year} has not been refreshed locally",
+                'missing': missing
+            }, status=404)
+        
+        # Refreshing either indicator changes its version and so the cache key
+        key_source = json.dumps([
+            x_indicator, versions[x_indicator].refreshed_at,
+            y_indicator, versions[y_indicator].refreshed_at,
+            start_year, end_year, country_codes
+        ], default=str)
+        cache_key = f"correlate:{hashlib.md5(key_source.encode()).hexdigest()}"
+        
+        result = cache.get(cache_key)
+        if result is None:
+            if not country_codes and not Country.objects.filter(is_aggregate=False).exists():
+                return Response({'error': 'Country metadata has not been loaded, run refresh_worldbank_data'}, status=404)
+            points = align_indicators(x_indicator, y_indicator, country_codes, start_year, end_year)
+            result = {
+                'x': x_indicator,
+                'y': y_indicator,
+                'start_year': start_year,
+                'end_year': end_year,
+                'points': points,
+                **summarize(points)
+            }
+            cache.set(cache_key, result, CORRELATE_CACHE_TIMEOUT)
+            logger.info(f"Correlated {result['n']} points, pearson: {result['pearson']}")
+        
+        if not include_regression:
+            result = {k: v for k, v in result.items() if k != 'regression'}
+        
+        return Response(result)
+        
+    except Exception as e:
+        logger.error(f"Error in get_correlation: {e}")
+        return Response({'error': str(e)}, status=500)
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def saved_dashboards(request):
+    """API endpoint to list or save the user's dashboard configurations"""
+    if request.method == 'GET':
+        dashboards = SavedDashboard.objects.filter(user=request.user)
+        return Response(SavedDashboardSerializer(dashboards, many=True).data)
+    
+    serializer = SavedDashboardSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+    
+    try:
+        dashboard = serializer.save(user=request.user)
+    except IntegrityError:
+        return Response({'error': 'A dashboard with this name already exists'}, status=400)
+    
+    try:
+        cache_bundle(dashboard)
+    except Exception as e:
+        # The bundle is rebuilt on first open, saving should not fail because of it
+        logger.error(f"Error precomputing bundle for dashboard {dashboard.id}: {e}")
+    
+    return Response(SavedDashboardSerializer(dashboard).data, status=201)
+
+@api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def saved_dashboard_detail(request, dashboard_id):
+    """API endpoint to read, update or delete one saved dashboard"""
+    dashboard = SavedDashboard.objects.filter(id=dashboard_id, user=request.user).first()
+    if dashboard is None:
+        return Response({'error': 'Dashboard not found'}, status=404)
+    
+    if request.method == 'GET':
+        return Response(SavedDashboardSerializer(dashboard).data)
+    
+    if request.method == 'DELETE':
+        discard_bundle(dashboard)
+        dashboard.delete()
+        return Response(status=204)
+    
+    serializer = SavedDashboardSerializer(dashboard, data=request.data, partial=request.method == 'PATCH')
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
+    
+    try:
+        dashboard = serializer.save()
+    except IntegrityError:
+        return Response({'error': 'A dashboard with this name already exists'}, status=400)
+    
+    try:
+        cache_bundle(dashboard)
+    except Exception as e:
+        logger.error(f"Error precomputing bundle for dashboard {dashboard.id}: {e}")
+        discard_bundle(dashboard)
+    
+    return Response(SavedDashboardSerializer(dashboard).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def saved_dashboard_bundle(request, dashboard_id):
+    """API endpoint to get all data for a saved dashboard in one response"""
+    bundle = cache.get(bundle_cache_key(request.user.id, dashboard_id))
+    if bundle is not None:
+        return Response(bundle)
+    
+    dashboard = SavedDashboard.objects.filter(id=dashboard_id, user=request.user).first()
+    if dashboard is None:
+        return Response({'error': 'Dashboard not found'}, status=404)
+    
+    try:
+        logger.info(f"Bundle cache miss for dashboard {dashboard.id}, building")
+        return Response(cache_bundle(dashboard))
+    except Exception as e:
+        logger.error(f"Error in saved_dashboard_bundle: {e}")
+        return Response({'error': str(e)}, status=500)
@@ -0,0 +1,208 @@
+# File: dashboard/worldbank.py
+import math
+import requests
+import logging
+from .ratelimit import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# World Bank indicator codes behind each dashboard view
+GDP_INDICATOR = 'NY.GDP.MKTP.CD'  # GDP (current US$)
+POPULATION_INDICATOR = 'SP.POP.TOTL'  # Population, total
+
+CLIMATE_INDICATORS = {
+    'co2_emissions': 'EN.ATM.CO2E.PC',  # CO2 emissions (metric tons per capita)
+    'renewable_energy': 'EG.FEC.RNEW.ZS',  # Renewable energy consumption (% of total final energy consumption)
+    'forest_area': 'AG.LND.FRST.ZS'  # Forest area (% of land area)
+}
+
+EDUCATION_INDICATORS = {
+    'literacy_rate': 'SE.ADT.LITR.ZS',  # Adult literacy rate (% of people ages 15 and above)
+    'school_enrollment': 'SE.PRM.NENR',  # Primary school enrollment (% net)
+    'completion_rate': 'SE.PRM.CMPT.ZS'  # Primary completion rate (% of relevant age group)
+}
+
+HEALTH_INDICATORS = {
+    'life_expectancy': 'SP.DYN.LE00.IN',  # Life expectancy at birth, total (years)
+    'infant_mortality': 'SP.DYN.IMRT.IN',  # Mortality rate, infant (per 1,000 live births)
+    'malnutrition': 'SH.STA.MALN.ZS'  # Malnutrition prevalence (% of children under 5)
+}
+
+# Friendly names accepted wherever an indicator code is expected
+INDICATOR_ALIASES = {
+    'gdp': GDP_INDICATOR,
+    'population': POPULATION_INDICATOR,
+    **CLIMATE_INDICATORS,
+    **EDUCATION_INDICATORS,
+    **HEALTH_INDICATORS,
+}
+
+class WorldBankAPI:
+    BASE_URL = "https://api.worldbank.org/v2"
+    # Rate limiter cost unit, the default dashboard request (5 countries x 13 years) costs 1
+    ROWS_PER_COST = 65
+    HEADERS = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    }
+    
+    @staticmethod
+    def request(url, params=None, cost=1):
+        """GET from World Bank within the shared request budget"""
+        limiter = get_rate_limiter()
+        limiter.acquire(cost)
+        response = requests.get(url, params=params, timeout=30, headers=WorldBankAPI.HEADERS)
+        
+        if response.status_code == 429:
+            try:
+                retry_after = int(response.headers.get('Retry-After', 30))
+            except ValueError:
+                retry_after = 30
+            limiter.backoff(retry_after)
+        return response
+    
+    @staticmethod
+    def get_countries():
+        """Get list of countries"""
+        try:
+            url = f"{WorldBankAPI.BASE_URL}/country?format=json&per_page=300"
+            response = WorldBankAPI.request(url)
+            logger.info(f"Countries API response status: {response.status_code}")
+            
+            if response.status_code == 200:
+                data = response.json()
+                logger.info(f"Countries API response length: {len(data)}")
+                if len(data) > 1:
+                    countries = []
+                    for country in data[1]:
+                        if country.get('capitalCity') and country.get('id') not in ['WLD', 'EUU', 'HPC', 'IBD', 'IBT', 'IDB', 'IDX', 'IDA', 'LIC', 'LMC', 'LMY', 'LTE', 'MIC', 'MNA', 'NAC', 'OED', 'PSS', 'PST', 'SAS', 'SSA', 'SSF', 'SST', 'TEA', 'TEC', 'TLA', 'TMN', 'TSA', 'TSS', 'UMC']:
+                            countries.append({
+                                'code': country['id'],
+                                'name': country['name']
+                            })
+                    logger.info(f"Found {len(countries)} valid countries")
+                    return countries[:30]  # Limit to 30 countries
+            return []
+        except Exception as e:
+            logger.error(f"Error fetching countries: {e}")
+            return []
+    
+    @staticmethod
+    def get_country_metadata():
+        """Get every country and aggregate World Bank knows, with ISO codes and region"""
+        try:
+            url = f"{WorldBankAPI.BASE_URL}/country"
+            params = {
+                'format': 'json',
+                'per_page': 500
+            }
+            response = WorldBankAPI.request(url, params=params)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if isinstance(data, list) and len(data) > 1 and data[1]:
+                    return data[1]
+            return []
+        except Exception as e:
+            logger.error(f"Error fetching country metadata: {e}")
+            return []
+    
+    @staticmethod
+    def get_indicator_data(country_codes, indicator, start_year=2010, end_year=2022):
+        """Get indicator data for countries"""
+        try:
+            # Clean country codes
+            country_codes = [code.strip() for code in country_codes if code.strip()]
+            countries_str = ';'.join(country_codes)
+            
+            url = f"{WorldBankAPI.BASE_URL}/country/{countries_str}/indicator/{indicator}"
+            params = {
+                'format': 'json',
+                'date': f"{start_year}:{end_year}",
+                'per_page': 2000
+            }
+            
+            # Wider requests weigh more against the caller's share of the budget
+            cost = math.ceil(len(country_codes) * (end_year - start_year + 1) / WorldBankAPI.ROWS_PER_COST)
+            
+            logger.info(f"Fetching data from: {url} with params: {params}")
+            response = WorldBankAPI.request(url, params=params, cost=max(1, cost))
+            logger.info(f"Indicator API response status: {response.status_code}")
+            
+            if response.status_code == 200:
+                data = response.json()
+                logger.info(f"Indicator API response structure: {type(data)}, length: {len(data) if isinstance(data, list) else 'N/A'}")
+                
+                if isinstance(data, list) and len(data) > 1 and data[1]:
+                    logger.info(f"Found {len(data[1])} data points")
+                    return data[1]
+                elif isinstance(data, dict) and 'message' in data:
+                    logger.warning(f"API returned message: {data['message']}")
+            return []
+        except Exception as e:
+            logger.error(f"Error fetching indicator data: {e}")
+            return []
+
+    @staticmethod
+    def get_indicator_last_updated(indicator):
+        """Get the lastupdated stamp World Bank reports for an indicator's source"""
+        try:
+            # A one-row page is enough, lastupdated lives in the page metadata
+            url = f"{WorldBankAPI.BASE_URL}/country/all/indicator/{indicator}"
+            params = {
+                'format': 'json',
+                'per_page': 1
+            }
+            response = WorldBankAPI.request(url, params=params)
+            
+            if response.status_code == 200:
+                data = response.json()
+                if isinstance(data, list) and data and isinstance(data[0], dict):
+                    return data[0].get('lastupdated')
+            return None
+        except Exception as e:
+            logger.error(f"Error fetching lastupdated for {indicator}: {e}")
+            return None
+    
+    @staticmethod
+    def get_indicator_snapshot(indicator, start_year=2010, end_year=2022):
+        """Get all countries' data for an indicator along with its lastupdated stamp.
+        
+        Follows pagination and returns (None, []) if any page fails, so a
+        partial download is never mistaken for the full indicator.
+        """
+        try:
+            url = f"{WorldBankAPI.BASE_URL}/country/all/indicator/{indicator}"
+            params = {
+                'format': 'json',
+                'date': f"{start_year}:{end_year}",
+                'per_page': 2000,
+                'page': 1
+            }
+            last_updated = None
+            rows = []
+            
+            while True:
+                response = WorldBankAPI.request(url, params=params)
+                if response.status_code != 200:
+                    logger.warning(f"Snapshot of {indicator} failed on page {params['page']}: {response.status_code}")
+                    return None, []
+                
+                data = response.json()
+                if not isinstance(data, list) or not data or not isinstance(data[0], dict):
+                    logger.warning(f"Unexpected snapshot response for {indicator}: {data}")
+                    return None, []
+                
+                meta = data[0]
+                last_updated = meta.get('lastupdated')
+                if len(data) > 1 and data[1]:
+                    rows.extend(data[1])
+                
+                if params['page'] >= int(meta.get('pages') or 1):
+                    break
+                params['page'] += 1
+            
+            logger.info(f"Snapshot of {indicator}: {len(rows)} rows, lastupdated {last_updated}")
+            return last_updated, rows
+        except Exception as e:
+            logger.error(f"Error fetching snapshot for {indicator}: {e}")
+            return None, []
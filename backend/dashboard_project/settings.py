@@ -29,6 +29,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dashboard.middleware.WorldBankPriorityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -86,6 +87,29 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Shared by all gunicorn workers and management commands, so a data refresh
+# invalidates cached responses everywhere
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / '.cache')),
+        'OPTIONS': {
+            # Django's default of 300 would cull saved-dashboard bundles at random
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int),
+        },
+    }
+}
+
+# World Bank API budget shared by every worker on this host
+WORLDBANK_RATE_LIMIT = config('WORLDBANK_RATE_LIMIT', default=5, cast=float)  # requests per second
+WORLDBANK_BURST = config('WORLDBANK_BURST', default=10, cast=int)
+WORLDBANK_USER_RATE_LIMIT = config('WORLDBANK_USER_RATE_LIMIT', default=2, cast=float)  # per user
+WORLDBANK_USER_BURST = config('WORLDBANK_USER_BURST', default=6, cast=int)
+WORLDBANK_INTERACTIVE_RESERVE = config('WORLDBANK_INTERACTIVE_RESERVE', default=3, cast=int)  # tokens kept for dashboard requests
+WORLDBANK_INTERACTIVE_MAX_WAIT = config('WORLDBANK_INTERACTIVE_MAX_WAIT', default=10, cast=float)  # seconds
+WORLDBANK_BACKGROUND_MAX_WAIT = config('WORLDBANK_BACKGROUND_MAX_WAIT', default=300, cast=float)
+WORLDBANK_RATE_LIMIT_FILE = config('WORLDBANK_RATE_LIMIT_FILE', default=str(BASE_DIR / '.cache' / 'worldbank-ratelimit.json'))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',